@@ -1,59 +1,164 @@
 import dataclasses
+import threading
 import uuid
+from typing import Any, NamedTuple
+import msgspec
+import orjson
 
-@dataclasses.dataclass
-class Place:
+class Place(msgspec.Struct):
     name: str
     address: str
     ID: str
     latitude: float
     longitude: float
-    viewport: any
+    viewport: Any
 
 class AddPlaceRequest():
     user_id: str
     place: Place  # This will hold the place object from the frontend
     activity_group: str
 
+# Version key for resources that span every user, such as the /users list; never a valid UUID
+ALL_USERS = "*"
+
+class Home(NamedTuple):
+    latitude: float
+    longitude: float
+
 @dataclasses.dataclass
 class UserInfo:
-    home: tuple[float, float]
+    home: Home
     places: dict[str, list[Place]]
     daily_plans: dict[str, list[Place]]
 
 class InfoManagerDict:
     def __init__(self):
         self.data = dict()
+        # Maps user ID -> casefolded place name -> places with that name in insertion order, so places can be found by
+        # name without scanning every group or lowercasing stored names on each lookup
+        self.name_index = dict()
+        # Serialized /users and /data/{uuid} responses; users never change after creation, so only add_user invalidates
+        self._users_payload_cache = None
+        self._user_payload_cache = dict()
+        # Maps (user ID, resource) -> a counter bumped on every change to that resource, used to build ETags
+        self.versions = dict()
+        # Versions restart from zero with each process, so ETags carry this per-instance epoch to keep a client's
+        # cached tag from matching a different process's data
+        self.epoch = uuid.uuid4().hex
+        # Per-user locks serializing writers, so concurrent requests for different users never contend. Readers take
+        # no lock, and each write bumps its version only after the data has changed.
+        self._locks = dict()
+        self._locks_guard = threading.Lock()
+
+    def lock(self, user_id: str):
+        """
+        Returns the lock guarding writes to the given user's data, creating it on first use.
+        """
+        user_lock = self._locks.get(user_id)
+        if user_lock is None:
+            with self._locks_guard:
+                user_lock = self._locks.setdefault(user_id, threading.Lock())
+        return user_lock
 
     def add_user(self, latitude: float, longitude: float):
         user_id = str(uuid.uuid4())
-        info = UserInfo(home=(latitude, longitude), places=dict(), daily_plans=dict())
-        self.data[user_id] = info
+        info = UserInfo(home=Home(latitude, longitude), places=dict(), daily_plans=dict())
+        self.name_index[user_id] = dict()
+        with self.lock(ALL_USERS):
+            self.data[user_id] = info
+            self._users_payload_cache = None
+            self._bump_version(ALL_USERS, "users")
         return user_id
 
     def get_user(self, user_id: str):
         return self.data[user_id]
+
+    def get_user_or_none(self, user_id: str):
+        return self.data.get(user_id)
+
+    def _user_summary(self, user_id: str):
+        home = self.data[user_id].home
+        return {
+            "user_id": user_id,
+            "homebase": {
+                "latitude": home.latitude,
+                "longitude": home.longitude
+            }
+        }
+
+    def users_payload(self):
+        """
+        Returns the JSON-encoded list of all users and their homebase locations, building it only after a user is added.
+        """
+        payload = self._users_payload_cache
+        if payload is None:
+            # Serialize outside the lock, and only keep the result if no user was added in the meantime
+            version = self.get_users_version()
+            payload = orjson.dumps({ "users": [self._user_summary(user_id) for user_id in list(self.data)] })
+            with self.lock(ALL_USERS):
+                if self.get_users_version() == version:
+                    self._users_payload_cache = payload
+        return payload
+
+    def user_payload(self, user_id: str):
+        """
+        Returns the JSON-encoded homebase location of a single user. Raises KeyError if the user does not exist.
+        """
+        if user_id not in self._user_payload_cache:
+            self._user_payload_cache[user_id] = orjson.dumps({ "user": self._user_summary(user_id) })
+        return self._user_payload_cache[user_id]
     
     def add_place(self, activity_group: str, user_id: str, name: str, address:str, place_id: str, latitude: float, longitude: float, viewport):
-        self.data[user_id].places[activity_group].append(Place(name, address, place_id, latitude, longitude, viewport))
+        place = Place(name, address, place_id, latitude, longitude, viewport)
+        with self.lock(user_id):
+            self.data[user_id].places[activity_group].append(place)
+            self.name_index[user_id].setdefault(name.casefold(), []).append(place)
+            self._bump_version(user_id, f"activity_group/{activity_group}")
+        return place
+
+    def get_place_by_name(self, user_id: str, name: str):
+        places = self.name_index[user_id].get(name.casefold())
+        return places[0] if places else None
+
+    def _unindex_places(self, user_id: str, removed: list[Place]):
+        """
+        Drops removed places from the name index.
+        """
+        index = self.name_index[user_id]
+        for place in removed:
+            name = place.name.casefold()
+            remaining = [p for p in index.get(name, []) if p is not place]
+            if remaining:
+                index[name] = remaining
+            else:
+                index.pop(name, None)
 
     def get_places(self, user_id: str):
-        return [place for places in self.data[user_id].places.values() for place in places]
+        with self.lock(user_id):
+            place_lists = list(self.data[user_id].places.values())
+        return [place for places in place_lists for place in places]
     
     def delete_place(self, user_id: str, activity_group: str, id: str):
-        if user_id in self.data and activity_group in self.data[user_id].places:
-            self.data[user_id].places[activity_group] = [
-                place for place in self.data[user_id].places[activity_group] if place.ID != id
-            ]
+        with self.lock(user_id):
+            if user_id in self.data and activity_group in self.data[user_id].places:
+                places = self.data[user_id].places[activity_group]
+                self.data[user_id].places[activity_group] = [place for place in places if place.ID != id]
+                self._unindex_places(user_id, [place for place in places if place.ID == id])
+                self._bump_version(user_id, f"activity_group/{activity_group}")
 
     def add_activity_group(self, user_id: str, activity_group: str):
-        self.data[user_id].places[activity_group] = []
+        with self.lock(user_id):
+            self.data[user_id].places[activity_group] = []
+            self._bump_version(user_id, f"activity_group/{activity_group}")
 
     def get_activity_group(self, user_id: str, activity_group: str):
         return self.data[user_id].places[activity_group]
     
     def delete_activity_group(self, user_id: str, activity_group: str):
-        del self.data[user_id].places[activity_group]
+        with self.lock(user_id):
+            removed = self.data[user_id].places.pop(activity_group)
+            self._unindex_places(user_id, removed)
+            self._bump_version(user_id, f"activity_group/{activity_group}")
 
     def activity_group_exists(self, user_id: str, activity_group: str):
         return user_id in self.data and activity_group in self.data[user_id].places
@@ -71,36 +176,66 @@ class InfoManagerDict:
                 "name": group_name,
                 "places": places
             }
-            for group_name, places in self.data[user_id].places.items()
+            for group_name, places in self.get_activity_groups_snapshot(user_id)
         ]
     
+    def get_version(self, user_id: str, resource: str):
+        return self.versions.get((user_id, resource), 0)
+
+    def get_users_version(self):
+        return self.get_version(ALL_USERS, "users")
+
+    def _bump_version(self, user_id: str, resource: str):
+        # Callers hold the user's lock, which makes this read-modify-write safe
+        key = (user_id, resource)
+        self.versions[key] = self.versions.get(key, 0) + 1
+
     def get_daily_plan(self, user_id: str, daily_plan_id: str):
         return self.data[user_id].daily_plans[daily_plan_id]
     
     def add_to_daily_plan(self, user_id: str, daily_plan_id: str, place_id: str):
-        for place_list in self.data[user_id].places.values():
-            print("place list:", place_list)
-            for place in place_list:
-                print("place:", place)
-                if place.ID == place_id:
-                    print("got in place")
-                    if daily_plan_id not in self.data[user_id].daily_plans:
-                        self.data[user_id].daily_plans[daily_plan_id] = []
-                    self.data[user_id].daily_plans[daily_plan_id].append(place)
-                    print("Adding to daily plan")
-                    print(self.data[user_id].daily_plans[daily_plan_id])
+        # The scan runs under the lock, since a concurrent add_activity_group could resize the dict mid-iteration
+        with self.lock(user_id):
+            matches = [
+                place for place_list in self.data[user_id].places.values() for place in place_list if place.ID == place_id
+            ]
+            if matches:
+                self.data[user_id].daily_plans.setdefault(daily_plan_id, []).extend(matches)
+                self._bump_version(user_id, f"daily_plan/{daily_plan_id}")
 
     def remove_from_daily_plan(self, user_id: str, daily_plan_id: str, place_id: str):
-        if user_id in self.data and daily_plan_id in self.data[user_id].daily_plans:
-            self.data[user_id].daily_plans[daily_plan_id] = [
-                place for place in self.data[user_id].daily_plans[daily_plan_id] if place.ID != place_id
-            ]
+        with self.lock(user_id):
+            if user_id in self.data and daily_plan_id in self.data[user_id].daily_plans:
+                self.data[user_id].daily_plans[daily_plan_id] = [
+                    place for place in self.data[user_id].daily_plans[daily_plan_id] if place.ID != place_id
+                ]
+                self._bump_version(user_id, f"daily_plan/{daily_plan_id}")
 
     def delete_daily_plan(self, user_id: str, daily_plan_id: str):
-        del self.data[user_id].daily_plans[daily_plan_id]
+        with self.lock(user_id):
+            del self.data[user_id].daily_plans[daily_plan_id]
+            self._bump_version(user_id, f"daily_plan/{daily_plan_id}")
 
     def create_daily_plan(self, user_id: str, daily_plan_id: str):
-        self.data[user_id].daily_plans[daily_plan_id] = []
+        with self.lock(user_id):
+            self.data[user_id].daily_plans[daily_plan_id] = []
+            self._bump_version(user_id, f"daily_plan/{daily_plan_id}")
+
+    def get_activity_groups_snapshot(self, user_id: str):
+        """
+        Returns the user's (activity group, places) pairs, copied under the lock so they can be iterated while the
+        groups are being changed.
+        """
+        with self.lock(user_id):
+            return list(self.data[user_id].places.items())
+
+    def get_daily_plans_snapshot(self, user_id: str):
+        """
+        Returns the user's (daily plan ID, places) pairs, copied under the lock so they can be iterated while the
+        plans are being changed.
+        """
+        with self.lock(user_id):
+            return list(self.data[user_id].daily_plans.items())
 
     def get_daily_plan_list(self, user_id: str):
         return list(self.data[user_id].daily_plans.keys())
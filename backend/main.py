@@ -1,16 +1,17 @@
-from typing import Union, Annotated
+from typing import Annotated
+import asyncio
 import os
 from dotenv import load_dotenv
-from fastapi import FastAPI, Body, HTTPException
+from fastapi import FastAPI, Body, HTTPException, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
-import googlemaps
+import httpx
+import msgspec
+import anyio.to_thread
+from cachetools import TTLCache
 from contextlib import asynccontextmanager
 from starlette.middleware.cors import CORSMiddleware
-import requests
 
-from models.place import Place
-from models.latlon import LatLon
-from models.route import Route
 from info_manager_dict import InfoManagerDict
 
 CORS_CONFIG = {
@@ -20,86 +21,279 @@ CORS_CONFIG = {
     "allow_headers": ["*"],
 }
 
-load_dotenv()
+GOOGLE_MAPS_BASE_URL = "https://maps.googleapis.com"
+GOOGLE_ROUTES_URL = "https://routes.googleapis.com/directions/v2:computeRoutes"
+
+ROUTE_FIELD_MASK = "routes.duration,routes.distanceMeters,routes.polyline.encodedPolyline"
+OPTIMIZED_ROUTE_FIELD_MASK = "routes.duration,routes.distanceMeters,routes.optimizedIntermediateWaypointIndex"
+
+# Only request the fields add_place stores, which keeps the Place Details response small and billed as Basic Data only
+PLACE_DETAILS_FIELDS = ",".join([
+    "name",
+    "place_id",
+    "geometry/location",  # Includes latitude and longitude
+    "formatted_address",
+    "geometry/viewport",
+])
+GEOCODE_CACHEABLE_STATUSES = ("OK", "ZERO_RESULTS")
+PLACE_NOT_FOUND_STATUSES = ("NOT_FOUND", "ZERO_RESULTS", "INVALID_REQUEST")
+
+GOOGLE_CONNECTION_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+GOOGLE_CONNECT_RETRIES = 2
+
+# Place lists longer than this are streamed to the client in chunks of this many places
+PLACE_STREAM_CHUNK_SIZE = 64
+
+CACHE_CONTROL = "private, max-age=30"
+
+GOOGLE_CACHE_SIZE = 4096
+GOOGLE_CACHE_TTL_SECONDS = 24 * 60 * 60
 
 db = InfoManagerDict()
-gmaps = googlemaps.Client(key=os.getenv("GOOGLE_MAPS_API_KEY"))
 
-app = FastAPI()
+# Only the fields the handlers consume are cached, not the full Google response
+geocode_cache = TTLCache(maxsize=GOOGLE_CACHE_SIZE, ttl=GOOGLE_CACHE_TTL_SECONDS)
+place_details_cache = TTLCache(maxsize=GOOGLE_CACHE_SIZE, ttl=GOOGLE_CACHE_TTL_SECONDS)
+
+def get_thread_limit():
+    """
+    Returns the threadpool size from HOMEBASE_THREADS, falling back to the CPU count when it is unset or empty.
+    """
+    value = os.getenv("HOMEBASE_THREADS")
+    if not value:
+        return os.cpu_count() or 1
+    error = ValueError(f"HOMEBASE_THREADS must be a positive integer, got {value!r}")
+    try:
+        thread_limit = int(value)
+    except ValueError:
+        raise error from None
+    if thread_limit < 1:
+        raise error
+    return thread_limit
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Loads the environment and opens the shared async HTTP client used for all Google Maps calls on startup, storing
+    both on app.state, and closes the client on shutdown. Also sizes the threadpool that runs the sync endpoints,
+    which defaults to the CPU count and can be overridden with HOMEBASE_THREADS.
+    """
+    load_dotenv()
+    app.state.google_maps_api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    anyio.to_thread.current_default_thread_limiter().total_tokens = get_thread_limit()
+    # One long-lived pool over HTTP/2, so concurrent Google calls share warm TLS connections instead of reconnecting
+    app.state.google_client = httpx.AsyncClient(
+        base_url=GOOGLE_MAPS_BASE_URL,
+        timeout=10,
+        transport=httpx.AsyncHTTPTransport(http2=True, limits=GOOGLE_CONNECTION_LIMITS, retries=GOOGLE_CONNECT_RETRIES),
+    )
+    yield
+    await app.state.google_client.aclose()
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 app.add_middleware(CORSMiddleware, **CORS_CONFIG)
 
+async def google_maps_get(state, path: str, params: dict):
+    """
+    Issues a GET against the Google Maps web service at the given path and returns the decoded JSON body.
+    """
+    try:
+        response = await state.google_client.get(path, params={**params, "key": state.google_maps_api_key})
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Google Maps request failed: {e}") from e
+    return response.json()
+
+class MsgspecJSONResponse(Response):
+    """
+    JSON response encoded directly with msgspec, used for payloads containing stored Place structs so they skip
+    FastAPI's jsonable_encoder pass.
+    """
+    media_type = "application/json"
+    encoder = msgspec.json.Encoder()
+
+    def render(self, content) -> bytes:
+        return self.encoder.encode(content)
+
+async def stream_places(places):
+    """
+    Yields a {"places": [...]} JSON body a chunk of places at a time, so the whole encoded list is never held in memory.
+    """
+    yield b'{"places":['
+    for start in range(0, len(places), PLACE_STREAM_CHUNK_SIZE):
+        if start:
+            yield b","
+        # Strip the brackets off each encoded chunk so the chunks join into a single array
+        yield MsgspecJSONResponse.encoder.encode(places[start:start + PLACE_STREAM_CHUNK_SIZE])[1:-1]
+    yield b"]}"
+
+def places_response(places, headers: dict):
+    """
+    Returns a {"places": [...]} response, streaming it when the list is long enough to be worth not encoding in one go.
+    """
+    if len(places) <= PLACE_STREAM_CHUNK_SIZE:
+        return MsgspecJSONResponse({ "places" : places }, headers=headers)
+    return StreamingResponse(stream_places(places), media_type="application/json", headers=headers)
+
+def get_user_or_404(user_id: str):
+    """
+    Returns the user's info with a single lookup, raising a 404 if the user does not exist.
+    """
+    user = db.get_user_or_none(user_id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+def make_etag(version: int):
+    return f'"{db.epoch}-{version:x}"'
+
+def not_modified(request: Request, response: Response, etag: str):
+    """
+    Sets the caching headers for a conditional GET and returns whether the client's cached copy is still current.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    # If-None-Match uses the weak comparison, so a W/ prefix is ignored and any listed tag (or *) matches
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag == "*" or tag.removeprefix("W/") == etag for tag in tags)
+
+def route_waypoint(place):
+    """
+    Converts a place into a Google Routes API waypoint.
+    """
+    return {
+        "location": {
+            "latLng": {
+                "latitude": place.latitude,
+                "longitude": place.longitude
+            }
+        }
+    }
+
+async def compute_route(state, places, field_mask: str, optimize_waypoint_order: bool = False):
+    """
+    Requests a single route visiting every place in order from the Google Routes API. The first and last places are the
+    origin and destination and everything in between is sent as intermediates, so the whole plan costs one request.
+    """
+    request_body = {
+        "origin": route_waypoint(places[0]),
+        "destination": route_waypoint(places[-1]),
+        "intermediates": [route_waypoint(place) for place in places[1:-1]],
+        "travelMode": "DRIVE",
+        "routingPreference": "TRAFFIC_AWARE",
+        "computeAlternativeRoutes": False,
+        "optimizeWaypointOrder": optimize_waypoint_order
+    }
+    headers = {
+        "X-Goog-Api-Key": state.google_maps_api_key,
+        "X-Goog-FieldMask": field_mask
+    }
+    try:
+        return await state.google_client.post(GOOGLE_ROUTES_URL, json=request_body, headers=headers)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Google Routes request failed: {e}") from e
+
+async def _geocode_cached(state, address: str):
+    """
+    Geocodes an address, returning a list of (latitude, longitude) tuples. Results are cached by the normalized address,
+    including empty results, so repeated unknown addresses do not go back to Google.
+    """
+    key = address.strip().lower()
+    if key in geocode_cache:
+        return geocode_cache[key]
+
+    geocode_result = await google_maps_get(state, "/maps/api/geocode/json", {"address": address})
+    # Quota, key and server errors also come back as HTTP 200 with no results, so they must not be cached as answers
+    if geocode_result.get("status") not in GEOCODE_CACHEABLE_STATUSES:
+        raise HTTPException(status_code=502, detail="Geocoding failed")
+
+    locations = [
+        (result['geometry']['location']['lat'], result['geometry']['location']['lng'])
+        for result in geocode_result['results']
+    ]
+    geocode_cache[key] = locations
+    return locations
+
+async def _place_details_cached(state, place_id: str):
+    """
+    Looks up a place with the Google Places API, returning a (place_id, name, address, latitude, longitude, viewport)
+    tuple, or None if Google has no such place. Results are cached by place ID.
+    """
+    key = place_id.strip()
+    if key in place_details_cache:
+        return place_details_cache[key]
+
+    place_result = await google_maps_get(state, "/maps/api/place/details/json",
+                                         {"place_id": key, "fields": PLACE_DETAILS_FIELDS})
+    if place_result.get("status") in PLACE_NOT_FOUND_STATUSES:
+        place_details_cache[key] = None
+        return None
+    if place_result.get("status") != "OK":
+        # Quota, key and server errors are temporary, so they are surfaced without being cached
+        raise HTTPException(status_code=502, detail="Place lookup failed")
+
+    place_info = place_result['result']
+    location = place_info['geometry']['location']
+    details = (
+        place_info['place_id'],
+        place_info['name'],
+        place_info["formatted_address"],
+        location['lat'],
+        location['lng'],
+        place_info['geometry']['viewport'],
+    )
+    place_details_cache[key] = details
+    return details
+
 @app.post("/place")
-def add_place(user_id: Annotated[str, Body()], place_id: Annotated[str, Body()], activity_group: Annotated[str, Body()]):
+async def add_place(user_id: Annotated[str, Body()], place_id: Annotated[str, Body()], activity_group: Annotated[str, Body()],
+                    request: Request):
     """
     Takes in a user ID, location name, and activity group from the frontend, adds a Place made with information from
     the Google Places API to the user's places, and returns the Place object.
     """
     print("Inside Post")
     print("UserID:", user_id)
-    try:
-        user = db.get_user(user_id)
-    except KeyError:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if not db.activity_group_exists(user_id, activity_group):
+    user = get_user_or_404(user_id)
+    if activity_group not in user.places:
         raise HTTPException(status_code=404, detail="Activity group not found")
     
-    desired_fields = [
-            "name",
-            "place_id",
-            "geometry/location",  # Includes latitude and longitude
-            "formatted_address",
-            "geometry/viewport",
-        ]
-    
-    # Bias results within 100km of the user's homebase
-    place_result = gmaps.place(place_id=place_id,  fields=desired_fields)
-    print("Successfully got Place")
-    # , user.home, radius=100000
-    print("Place REsult:", place_result)
-    # if not place_result['results']:
-    #     raise HTTPException(status_code=404, detail="Place not found")
-
-    place_info = place_result['result']
+    place_details = await _place_details_cached(request.app.state, place_id)
+    if place_details is None:
+        raise HTTPException(status_code=404, detail="Place not found")
 
-    place_id = place_info['place_id']
-    name = place_info['name']
-    location = place_info['geometry']['location']
-    latitude = location['lat']
-    longitude = location['lng']
-    viewport  = place_info['geometry']['viewport']
-    address = place_info["formatted_address"]
+    place_id, name, address, latitude, longitude, viewport = place_details
 
-    db.add_place(activity_group, user_id, name, address, place_id, latitude, longitude, viewport)
-    # return {"message": "Successfully Added Place"}
-    place = Place(name=name, ID=place_id, address = address,  latitude=latitude, longitude=longitude, viewport=viewport)
-    return { "place":place}
+    try:
+        place = db.add_place(activity_group, user_id, name, address, place_id, latitude, longitude, viewport)
+    except KeyError:
+        # The group was deleted while we were waiting on Google
+        raise HTTPException(status_code=404, detail="Activity group not found")
+    return MsgspecJSONResponse({ "place": place })
 
 @app.get("/place")
 def get_place(user_id: str, place_name: str):
     """
     Takes in a user ID and a location name from the frontend, returns a Place object with information from the user's places
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    user_places = db.get_places(user_id)
+    get_user_or_404(user_id)
 
-    place = next((p for p in user_places if p.name.lower() == place_name.lower()), None)
+    place = db.get_place_by_name(user_id, place_name)
     if not place:
         raise HTTPException(status_code=404, detail="Place not found for this user")
 
-    return { "place": Place(name=place.name, ID=place.ID, latitude=place.latitude, longitude=place.longitude) }
+    return MsgspecJSONResponse({ "place": place })
 
 @app.delete("/place")
 def delete_place(user_id: Annotated[str, Body()], activity_group: Annotated[str, Body()], place_id: Annotated[str, Body()]):
     """
     Takes in a user ID, location name, and activity group from the frontend, deletes the place from the user's places
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if not db.activity_group_exists(user_id, activity_group):
+    user = get_user_or_404(user_id)
+    if activity_group not in user.places:
         raise HTTPException(status_code=404, detail="Activity group not found")
     
     db.delete_place(user_id, activity_group, place_id)
@@ -111,105 +305,101 @@ def add_activity_group(user_id: Annotated[str, Body()], activity_group: Annotate
     """
     Takes in a user ID and an activity group name from the frontend, adds the activity group to the user's places
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
+    get_user_or_404(user_id)
     
     db.add_activity_group(user_id, activity_group)
 
     return { "message" : "success" }
 
 @app.get("/activity-group")
-def get_activity_group(user_id: Annotated[str, Body()], activity_group: Annotated[str, Body()]):
+def get_activity_group(user_id: str, activity_group: str, request: Request, response: Response):
     """
-    Takes in a user ID and an activity group name from the frontend, returns the activity group from the user's places
+    Takes in a user ID and an activity group name from the frontend, returns the activity group from the user's places.
+    Responds with 304 Not Modified if the client's ETag matches the group's current version.
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    places = db.get_activity_group(user_id, activity_group)
-
-    return { "places" : [
-        Place(
-            name=place.name,
-            ID=place.ID,
-            latitude=place.latitude,
-            longitude=place.longitude
-        )
-        for place in places
-    ] }
+    user = get_user_or_404(user_id)
+
+    # Read the version before the places, so a concurrent write can only make the ETag older than the data
+    etag = make_etag(db.get_version(user_id, f"activity_group/{activity_group}"))
+    places = user.places.get(activity_group)
+    if places is None:
+        raise HTTPException(status_code=404, detail="Activity group not found")
+
+    if not_modified(request, response, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+
+    return places_response(places, dict(response.headers))
 
 @app.delete("/activity-group")
 def delete_activity_group(user_id: Annotated[str, Body()], activity_group: Annotated[str, Body()]):
     """
     Takes in a user ID and an activity group name from the frontend, deletes the activity group from the user's places
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
+    get_user_or_404(user_id)
     
     db.delete_activity_group(user_id, activity_group)
 
     return { "message" : "success" }
 
 @app.post("/homebase")
-def set_homebase(address: Annotated[str, Body()]):
+async def set_homebase(address: Annotated[str, Body()], request: Request):
     """
     Takes in a address from the frontend, sets the information for use in the backend, and returns the UUID associated with 
     the user.
     """
-    geocode_result = gmaps.geocode(address)
+    geocode_result = await _geocode_cached(request.app.state, address)
+    if not geocode_result:
+        raise HTTPException(status_code=404, detail="Address not found")
 
-    lat = geocode_result[0]['geometry']['location']['lat']
-    lng = geocode_result[0]['geometry']['location']['lng']
+    lat, lng = geocode_result[0]
     
     uuid = db.add_user(lat, lng)
 
     return { "uuid": uuid }
 
 @app.get("/route")
-def get_route(user_id: Annotated[str, Body()], daily_plan_id: Annotated[str, Body()]):
+async def get_route(user_id: str, daily_plan_id: str, request: Request):
     """
     Takes in a daily plan ID from the frontend, returns a Route made from the cooresponding places using the Google Routes API
     """
+    user = get_user_or_404(user_id)
+
+    places = user.daily_plans.get(daily_plan_id)
+    if places is None:
+        raise HTTPException(status_code=404, detail="Daily plan not found")
 
-    places = db.get_daily_plan(user_id, daily_plan_id)
+    if len(places) < 2:
+        raise HTTPException(status_code=400, detail="Daily plan needs at least two places to route")
 
-    #Google API Call
+    response = await compute_route(request.app.state, places, ROUTE_FIELD_MASK)
+    if response.status_code != 200:
+        raise HTTPException(status_code=502, detail="Failed to compute route")
 
-    return { "message" : f"Loaded places for '{daily_plan_id}'."}
+    return { "route" : response.json() }
 
 @app.get("/users")
-def get_users():
+def get_users(request: Request, response: Response):
     """
-    Returns a list of all users in the database with their homebase locations
+    Returns a list of all users in the database with their homebase locations. Responds with 304 Not Modified if
+    no user has been added since the client's ETag.
     """
-    users = []
-    for user_id, user_info in db.data.items():
-        users.append({
-            "user_id": user_id,
-            "homebase": {
-                "latitude": user_info.home[0],
-                "longitude": user_info.home[1]
-            }
-        })
-    
-    return { "users": users }
+    etag = make_etag(db.get_users_version())
+    if not_modified(request, response, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+
+    return Response(db.users_payload(), media_type="application/json", headers=dict(response.headers))
 
 @app.get("/data/{uuid}")
-def get_user_data():
+def get_user_data(uuid: str):
     """
-    Returns a list of all users in the database with their homebase locations
+    Returns the homebase location of the user with the given UUID
     """
-    users = []
-    for user_id, user_info in db.data.items():
-        users.append({
-            "user_id": user_id,
-            "homebase": {
-                "latitude": user_info.home[0],
-                "longitude": user_info.home[1]
-            }
-        })
-    
-    return { "users": users }
+    try:
+        payload = db.user_payload(uuid)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    return Response(payload, media_type="application/json")
 
 @app.put("/place/daily-plan")
 def add_place_to_daily_plan(user_id: Annotated[str, Body()], 
@@ -218,8 +408,7 @@ def add_place_to_daily_plan(user_id: Annotated[str, Body()],
     """
     Takes in a user ID, place ID, and daily plan ID from the frontend, adds the place to the daily plan.
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
+    get_user_or_404(user_id)
     print("daily_plan_id", daily_plan_id)
     print("place_id", place_id)
     db.add_to_daily_plan(user_id, daily_plan_id, place_id)
@@ -234,42 +423,39 @@ def remove_place_from_daily_plan(user_id: Annotated[str, Body()],
     """
     Takes in a user ID, and place ID from the frontend, removes the place from it's the daily plan.
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
+    get_user_or_404(user_id)
     
     db.remove_from_daily_plan(user_id, daily_plan_id, place_id)
 
     return { "message" : "success" }
 
 @app.get("/daily-plan")
-def get_daily_plan(user_id: Annotated[str, Body()], daily_plan_id: Annotated[str, Body()]):
+def get_daily_plan(user_id: str, daily_plan_id: str, request: Request, response: Response):
     """
     Takes in a user ID and an daily plan ID from the frontend, returns the daily plan from the user's places.
+    Responds with 304 Not Modified if the client's ETag matches the plan's current version.
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    places = db.get_daily_plan(user_id, daily_plan_id)
-
-    return { "places" : [
-        Place(
-            name=place.name,
-            ID=place.ID,
-            latitude=place.latitude,
-            longitude=place.longitude
-        )
-        for place in places
-    ] }
+    user = get_user_or_404(user_id)
+
+    # Read the version before the places, so a concurrent write can only make the ETag older than the data
+    etag = make_etag(db.get_version(user_id, f"daily_plan/{daily_plan_id}"))
+    places = user.daily_plans.get(daily_plan_id)
+    if places is None:
+        raise HTTPException(status_code=404, detail="Daily plan not found")
+
+    if not_modified(request, response, etag):
+        return Response(status_code=304, headers=dict(response.headers))
+
+    return places_response(places, dict(response.headers))
 
 @app.get("/daily-plan/all")
-def get_all_daily_plan_ids(user_id: Annotated[str, Body()]):
+def get_all_daily_plan_ids(user_id: str):
     """
     Takes in a user id from the frontend, returns a list of all the daily plans the user has.
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
+    user = get_user_or_404(user_id)
     
-    dp_list = db.get_daily_plan_list(user_id)
+    dp_list = list(user.daily_plans)
 
     return { "daily_plans" : dp_list }
 
@@ -278,8 +464,7 @@ def delete_daily_plan(user_id: Annotated[str, Body()], daily_plan_id: Annotated[
     """
     Takes in a user id and daily plan id front the frontend, deletes the associated daily plan
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
+    get_user_or_404(user_id)
     
     db.delete_daily_plan(user_id, daily_plan_id)
 
@@ -290,8 +475,7 @@ def add_daily_plan(user_id: Annotated[str, Body()], daily_plan_id: Annotated[str
     """
     Takes in a user id and daily plan id front the frontend, creates a daily plan with that id
     """
-    if user_id not in db.data:
-        raise HTTPException(status_code=404, detail="User not found")
+    get_user_or_404(user_id)
     
     db.create_daily_plan(user_id, daily_plan_id)
 
@@ -301,85 +485,39 @@ class OptimizeRoutesRequest(BaseModel):
     user_id: str
 
 @app.post("/optimize-routes")
-async def optimize_routes(request: OptimizeRoutesRequest):
+async def optimize_routes(optimize_request: OptimizeRoutesRequest, request: Request):
     """
     Takes in a user ID and optimizes routes for all trips in their vacation plans
     using Google Maps Compute Routes API.
     """
+    get_user_or_404(optimize_request.user_id)
+
     try:
         print("Got in Optimze Routes")
-        user_id = request.user_id
-        # Get all daily plans for the user
-        daily_plans = db.get_daily_plan_list(user_id)
-
-        print("Got daily Plan:", daily_plans)
-        
-        optimized_routes = []
-        
-        for plan_id in daily_plans:
-            places = db.get_daily_plan(user_id, plan_id)
-            print("Places:", places)
-            
-            if not places or len(places) < 2:
-                continue
-                
-            # Prepare request for Google Maps API
-            origin = {
-                "location": {
-                    "latLng": {
-                        "latitude": places[0].latitude,
-                        "longitude": places[0].longitude
-                    }
-                }
-            }
-            
-            destination = {
-                "location": {
-                    "latLng": {
-                        "latitude": places[-1].latitude,
-                        "longitude": places[-1].longitude
-                    }
-                }
-            }
-            
-            intermediates = []
-            for place in places[1:-1]:
-                intermediates.append({
-                    "location": {
-                        "latLng": {
-                            "latitude": place.latitude,
-                            "longitude": place.longitude
-                        }
-                    }
-                })
-            
-            request_body = {
-                "origin": origin,
-                "destination": destination,
-                "intermediates": intermediates,
-                "travelMode": "DRIVE",
-                "routingPreference": "TRAFFIC_AWARE",
-                "computeAlternativeRoutes": False,
-                "optimizeWaypointOrder": True
-            }
-            
-            # Make request to Google Maps API
-            url = "https://routes.googleapis.com/directions/v2:computeRoutes"
-            headers = {
-                "X-Goog-Api-Key": os.getenv("GOOGLE_MAPS_API_KEY"),
-                "X-Goog-FieldMask": "routes.duration,routes.distanceMeters,routes.optimizedIntermediateWaypointIndex"
+        # Only plans with at least two stops have a route to optimize
+        plan_places = {
+            plan_id: places for plan_id, places in db.get_daily_plans_snapshot(optimize_request.user_id) if len(places) >= 2
+        }
+
+        # Request every plan's route concurrently rather than one after another
+        responses = await asyncio.gather(*[
+            compute_route(request.app.state, places, OPTIMIZED_ROUTE_FIELD_MASK, optimize_waypoint_order=True)
+            for places in plan_places.values()
+        ])
+
+        optimized_routes = [
+            {
+                "plan_id": plan_id,
+                "route_data": response.json()
             }
-            
-            response = requests.post(url, json=request_body, headers=headers)
-            if response.status_code == 200:
-                route_data = response.json()
-                optimized_routes.append({
-                    "plan_id": plan_id,
-                    "route_data": route_data
-                })
+            for plan_id, response in zip(plan_places, responses)
+            if response.status_code == 200
+        ]
         print("Optimized Routes:", optimized_routes)
         return {"optimized_routes": optimized_routes}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -388,15 +526,12 @@ def get_all_daily_plans(user_id: str):
     """
     Retrieve all daily plans for a specific user.
     """
-    try:
-        user_data = db.get_user(user_id)
-        daily_plans = [
-            {
-                "daily_plan_id": plan_id,
-                "places": plan_places,
-            }
-            for plan_id, plan_places in user_data.daily_plans.items()
-        ]
-        return {"daily_plans": daily_plans}
-    except KeyError:
-        raise HTTPException(status_code=404, detail="User not found")
\ No newline at end of file
+    get_user_or_404(user_id)
+    daily_plans = [
+        {
+            "daily_plan_id": plan_id,
+            "places": plan_places,
+        }
+        for plan_id, plan_places in db.get_daily_plans_snapshot(user_id)
+    ]
+    return MsgspecJSONResponse({"daily_plans": daily_plans})
\ No newline at end of file
@@ -1,4 +1,6 @@
+import threading
 import unittest
+import orjson
 from info_manager_dict import InfoManagerDict, Place
 
 class TestInfoManagerDict(unittest.TestCase):
@@ -12,10 +14,29 @@ class TestInfoManagerDict(unittest.TestCase):
         self.assertEqual(len(self.manager.data[user_id].places), 0)
         self.assertEqual(len(self.manager.data[user_id].daily_plans), 0)
 
+    def test_get_user_or_none(self):
+        user_id = self.manager.add_user(40.7128, -74.0060)
+        self.assertIs(self.manager.get_user_or_none(user_id), self.manager.data[user_id])
+        self.assertIsNone(self.manager.get_user_or_none("missing"))
+
+    def test_users_payload(self):
+        user1 = self.manager.add_user(40.7128, -74.0060)
+        payload = orjson.loads(self.manager.users_payload())
+        self.assertEqual([user["user_id"] for user in payload["users"]], [user1])
+
+        user2 = self.manager.add_user(34.0522, -118.2437)
+        payload = orjson.loads(self.manager.users_payload())
+        self.assertEqual([user["user_id"] for user in payload["users"]], [user1, user2])
+
+        user = orjson.loads(self.manager.user_payload(user2))["user"]
+        self.assertEqual(user["homebase"], {"latitude": 34.0522, "longitude": -118.2437})
+        with self.assertRaises(KeyError):
+            self.manager.user_payload("missing")
+
     def test_add_place(self):
         user_id = self.manager.add_user(40.7128, -74.0060)
         self.manager.add_activity_group(user_id, "parks")
-        self.manager.add_place("parks", user_id, "Central Park", "park1", 40.7829, -73.9654)
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
         
         places = self.manager.get_places(user_id)
         self.assertEqual(len(places), 1)
@@ -29,8 +50,8 @@ class TestInfoManagerDict(unittest.TestCase):
         self.manager.add_activity_group(user_id, "parks")
         self.manager.add_activity_group(user_id, "squares")
         
-        self.manager.add_place("parks", user_id, "Central Park", "park1", 40.7829, -73.9654)
-        self.manager.add_place("squares", user_id, "Times Square", "square1", 40.7580, -73.9855)
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+        self.manager.add_place("squares", user_id, "Times Square", "", "square1", 40.7580, -73.9855, None)
 
         places = self.manager.get_places(user_id)
         self.assertEqual(len(places), 2)
@@ -47,8 +68,8 @@ class TestInfoManagerDict(unittest.TestCase):
         self.manager.add_activity_group(user1, "parks")
         self.manager.add_activity_group(user2, "landmarks")
 
-        self.manager.add_place("parks", user1, "Central Park", "park1", 40.7829, -73.9654)
-        self.manager.add_place("landmarks", user2, "Hollywood Sign", "sign1", 34.1341, -118.3215)
+        self.manager.add_place("parks", user1, "Central Park", "", "park1", 40.7829, -73.9654, None)
+        self.manager.add_place("landmarks", user2, "Hollywood Sign", "", "sign1", 34.1341, -118.3215, None)
 
         places1 = self.manager.get_places(user1)
         places2 = self.manager.get_places(user2)
@@ -65,10 +86,34 @@ class TestInfoManagerDict(unittest.TestCase):
         self.assertTrue(self.manager.activity_group_exists(user_id, "parks"))
         self.assertFalse(self.manager.activity_group_exists(user_id, "squares"))
 
+    def test_get_place_by_name(self):
+        user_id = self.manager.add_user(40.7128, -74.0060)
+        self.manager.add_activity_group(user_id, "parks")
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+
+        place = self.manager.get_place_by_name(user_id, "central park")
+        self.assertEqual(place.ID, "park1")
+        self.assertIsNone(self.manager.get_place_by_name(user_id, "Times Square"))
+
+        self.manager.delete_place(user_id, "parks", "park1")
+        self.assertIsNone(self.manager.get_place_by_name(user_id, "Central Park"))
+
+    def test_get_place_by_name_duplicates_and_casefold(self):
+        user_id = self.manager.add_user(52.5200, 13.4050)
+        self.manager.add_activity_group(user_id, "streets")
+        self.manager.add_activity_group(user_id, "shops")
+        self.manager.add_place("streets", user_id, "Hauptstraße", "", "street1", 52.5, 13.4, None)
+        self.manager.add_place("shops", user_id, "Hauptstrasse", "", "shop1", 52.6, 13.5, None)
+
+        self.assertEqual(self.manager.get_place_by_name(user_id, "HAUPTSTRASSE").ID, "street1")
+
+        self.manager.delete_activity_group(user_id, "streets")
+        self.assertEqual(self.manager.get_place_by_name(user_id, "hauptstraße").ID, "shop1")
+
     def test_delete_place(self):
         user_id = self.manager.add_user(40.7128, -74.0060)
         self.manager.add_activity_group(user_id, "parks")
-        self.manager.add_place("parks", user_id, "Central Park", "park1", 40.7829, -73.9654)
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
         
         self.manager.delete_place(user_id, "parks", "park1")
         places = self.manager.get_places(user_id)
@@ -86,7 +131,7 @@ class TestInfoManagerDict(unittest.TestCase):
     def test_add_to_daily_plan(self):
         user_id = self.manager.add_user(40.7128, -74.0060)
         self.manager.add_activity_group(user_id, "parks")
-        self.manager.add_place("parks", user_id, "Central Park", "park1", 40.7829, -73.9654)
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
         self.manager.create_daily_plan(user_id, "morning")
 
         self.manager.add_to_daily_plan(user_id, "morning", "park1")
@@ -98,7 +143,7 @@ class TestInfoManagerDict(unittest.TestCase):
     def test_remove_from_daily_plan(self):
         user_id = self.manager.add_user(40.7128, -74.0060)
         self.manager.add_activity_group(user_id, "parks")
-        self.manager.add_place("parks", user_id, "Central Park", "park1", 40.7829, -73.9654)
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
         self.manager.create_daily_plan(user_id, "morning")
         self.manager.add_to_daily_plan(user_id, "morning", "park1")
 
@@ -107,6 +152,86 @@ class TestInfoManagerDict(unittest.TestCase):
         
         self.assertEqual(len(places_in_plan), 0)
 
+    def test_daily_plan_version(self):
+        user_id = self.manager.add_user(40.7128, -74.0060)
+        self.manager.add_activity_group(user_id, "parks")
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+        self.assertEqual(self.manager.get_version(user_id, "daily_plan/morning"), 0)
+
+        self.manager.create_daily_plan(user_id, "morning")
+        created = self.manager.get_version(user_id, "daily_plan/morning")
+        self.manager.add_to_daily_plan(user_id, "morning", "park1")
+        added = self.manager.get_version(user_id, "daily_plan/morning")
+        self.manager.remove_from_daily_plan(user_id, "morning", "park1")
+        removed = self.manager.get_version(user_id, "daily_plan/morning")
+
+        self.assertLess(0, created)
+        self.assertLess(created, added)
+        self.assertLess(added, removed)
+        self.assertEqual(self.manager.get_version(user_id, "daily_plan/evening"), 0)
+
+    def test_activity_group_and_users_version(self):
+        users_version = self.manager.get_users_version()
+        user_id = self.manager.add_user(40.7128, -74.0060)
+        self.assertLess(users_version, self.manager.get_users_version())
+
+        self.manager.add_activity_group(user_id, "parks")
+        created = self.manager.get_version(user_id, "activity_group/parks")
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+        added = self.manager.get_version(user_id, "activity_group/parks")
+        self.manager.delete_place(user_id, "parks", "park1")
+        deleted = self.manager.get_version(user_id, "activity_group/parks")
+
+        self.assertLess(0, created)
+        self.assertLess(created, added)
+        self.assertLess(added, deleted)
+
+    def test_concurrent_add_place(self):
+        user_id = self.manager.add_user(40.7128, -74.0060)
+        self.manager.add_activity_group(user_id, "parks")
+        version = self.manager.get_version(user_id, "activity_group/parks")
+
+        def add_places(worker):
+            for i in range(100):
+                self.manager.add_place("parks", user_id, f"Park {worker}-{i}", "", f"park{worker}-{i}", 40.0, -73.0, None)
+
+        threads = [threading.Thread(target=add_places, args=(worker,)) for worker in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.manager.get_places(user_id)), 800)
+        self.assertEqual(self.manager.get_version(user_id, "activity_group/parks"), version + 800)
+
+    def test_concurrent_add_to_daily_plan(self):
+        user_id = self.manager.add_user(40.7128, -74.0060)
+        self.manager.add_activity_group(user_id, "parks")
+        self.manager.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+        self.manager.create_daily_plan(user_id, "morning")
+        errors = []
+
+        def add_groups():
+            for i in range(2000):
+                self.manager.add_activity_group(user_id, f"group{i}")
+
+        def add_to_plan():
+            try:
+                for _ in range(2000):
+                    self.manager.add_to_daily_plan(user_id, "morning", "park1")
+                    self.manager.get_places(user_id)
+            except RuntimeError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=add_groups), threading.Thread(target=add_to_plan)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.manager.data[user_id].daily_plans["morning"]), 2000)
+
     def test_delete_daily_plan(self):
         user_id = self.manager.add_user(40.7128, -74.0060)
         self.manager.create_daily_plan(user_id, "morning")
@@ -0,0 +1,235 @@
+import os
+import unittest
+from unittest import mock
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from info_manager_dict import InfoManagerDict
+
+def geocode_reply(status, results=()):
+    return httpx.Response(200, json={"status": status, "results": list(results)})
+
+def geocode_result(lat, lng):
+    return {"geometry": {"location": {"lat": lat, "lng": lng}}}
+
+def place_details_reply(status, place_id="place1"):
+    if status != "OK":
+        return httpx.Response(200, json={"status": status})
+    return httpx.Response(200, json={"status": "OK", "result": {
+        "place_id": place_id,
+        "name": "Central Park",
+        "formatted_address": "New York, NY",
+        "geometry": {"location": {"lat": 40.7829, "lng": -73.9654}, "viewport": {}},
+    }})
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        os.environ.setdefault("GOOGLE_MAPS_API_KEY", "test-key")
+        main.db = InfoManagerDict()
+        main.geocode_cache.clear()
+        main.place_details_cache.clear()
+
+        # Each Google path maps to a list of replies, handed out in order
+        self.replies = {}
+        self.calls = []
+
+        def handler(request):
+            self.calls.append(request.url.path)
+            reply = self.replies[request.url.path].pop(0)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        patcher = mock.patch.object(main.httpx, "AsyncHTTPTransport",
+                                    lambda **kwargs: httpx.MockTransport(handler))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.client = TestClient(main.app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def test_set_homebase(self):
+        self.replies["/maps/api/geocode/json"] = [geocode_reply("OK", [geocode_result(48.8566, 2.3522)])]
+
+        response = self.client.post("/homebase", json="Paris")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(main.db.get_user(response.json()["uuid"]).home, (48.8566, 2.3522))
+
+        # Same address after normalization is served from the cache
+        self.client.post("/homebase", json=" paris ")
+        self.assertEqual(len(self.calls), 1)
+
+    def test_set_homebase_zero_results(self):
+        self.replies["/maps/api/geocode/json"] = [geocode_reply("ZERO_RESULTS")]
+
+        self.assertEqual(self.client.post("/homebase", json="Nowhere").status_code, 404)
+        self.assertEqual(self.client.post("/homebase", json="nowhere").status_code, 404)
+        self.assertEqual(len(self.calls), 1)
+
+    def test_set_homebase_error_status_is_not_cached(self):
+        self.replies["/maps/api/geocode/json"] = [
+            geocode_reply("OVER_QUERY_LIMIT"),
+            geocode_reply("OK", [geocode_result(48.8566, 2.3522)]),
+        ]
+
+        self.assertEqual(self.client.post("/homebase", json="Paris").status_code, 502)
+        self.assertEqual(self.client.post("/homebase", json="Paris").status_code, 200)
+        self.assertEqual(len(self.calls), 2)
+
+    def test_set_homebase_upstream_timeout(self):
+        self.replies["/maps/api/geocode/json"] = [httpx.ConnectTimeout("timed out")]
+
+        response = self.client.post("/homebase", json="Paris")
+        self.assertEqual(response.status_code, 502)
+        self.assertEqual(main.geocode_cache.currsize, 0)
+
+    def test_add_place(self):
+        user_id = main.db.add_user(40.7128, -74.0060)
+        main.db.add_activity_group(user_id, "parks")
+        self.replies["/maps/api/place/details/json"] = [
+            place_details_reply("OVER_QUERY_LIMIT"),
+            place_details_reply("OK"),
+            place_details_reply("NOT_FOUND"),
+        ]
+        body = {"user_id": user_id, "place_id": "place1", "activity_group": "parks"}
+
+        self.assertEqual(self.client.post("/place", json=body).status_code, 502)
+
+        response = self.client.post("/place", json=body)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["place"]["ID"], "place1")
+
+        self.assertEqual(self.client.post("/place", json={**body, "place_id": "missing"}).status_code, 404)
+        self.assertEqual(self.client.post("/place", json={**body, "activity_group": "museums"}).status_code, 404)
+
+    def test_get_place(self):
+        user_id = main.db.add_user(40.7128, -74.0060)
+        main.db.add_activity_group(user_id, "parks")
+        main.db.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+
+        response = self.client.get("/place", params={"user_id": user_id, "place_name": "central park"})
+        self.assertEqual(response.json()["place"]["ID"], "park1")
+        response = self.client.get("/place", params={"user_id": user_id, "place_name": "Times Square"})
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get("/place", params={"user_id": "missing", "place_name": "Central Park"})
+        self.assertEqual(response.status_code, 404)
+
+    def test_users_and_user_data(self):
+        user_id = main.db.add_user(40.7128, -74.0060)
+        homebase = {"latitude": 40.7128, "longitude": -74.0060}
+
+        response = self.client.get("/users")
+        self.assertEqual(response.json(), {"users": [{"user_id": user_id, "homebase": homebase}]})
+        etag = response.headers["etag"]
+        self.assertEqual(self.client.get("/users", headers={"If-None-Match": etag}).status_code, 304)
+
+        # A restarted process counts versions from zero again, but its epoch keeps the old tag from matching
+        main.db = InfoManagerDict()
+        main.db.add_user(40.7128, -74.0060)
+        self.assertNotEqual(self.client.get("/users").headers["etag"], etag)
+        self.assertEqual(self.client.get("/users", headers={"If-None-Match": etag}).status_code, 200)
+
+        main.db = InfoManagerDict()
+        user_id = main.db.add_user(40.7128, -74.0060)
+        etag = self.client.get("/users").headers["etag"]
+        main.db.add_user(34.0522, -118.2437)
+        response = self.client.get("/users", headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["users"]), 2)
+
+        response = self.client.get(f"/data/{user_id}")
+        self.assertEqual(response.json(), {"user": {"user_id": user_id, "homebase": homebase}})
+        self.assertEqual(self.client.get("/data/missing").status_code, 404)
+
+    def test_activity_group_conditional_get(self):
+        user_id = main.db.add_user(40.7128, -74.0060)
+        main.db.add_activity_group(user_id, "parks")
+        params = {"user_id": user_id, "activity_group": "parks"}
+
+        response = self.client.get("/activity-group", params=params)
+        self.assertEqual(response.json(), {"places": []})
+        etag = response.headers["etag"]
+        self.assertEqual(self.client.get("/activity-group", params=params, headers={"If-None-Match": etag}).status_code, 304)
+
+        main.db.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+        response = self.client.get("/activity-group", params=params, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["places"]), 1)
+
+        response = self.client.get("/activity-group", params={**params, "activity_group": "museums"},
+                                   headers={"If-None-Match": '"0"'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_activity_group_streams_long_lists(self):
+        user_id = main.db.add_user(40.7128, -74.0060)
+        main.db.add_activity_group(user_id, "parks")
+        for i in range(70):
+            main.db.add_place("parks", user_id, f"Park {i}", "", f"park{i}", 40.0 + i, -73.0, None)
+
+        response = self.client.get("/activity-group", params={"user_id": user_id, "activity_group": "parks"})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("etag", response.headers)
+        places = response.json()["places"]
+        self.assertEqual([place["ID"] for place in places], [f"park{i}" for i in range(70)])
+        self.assertEqual(places[69]["latitude"], 109.0)
+
+    def test_daily_plan_conditional_get(self):
+        user_id = main.db.add_user(40.7128, -74.0060)
+        main.db.add_activity_group(user_id, "parks")
+        main.db.add_place("parks", user_id, "Central Park", "", "park1", 40.7829, -73.9654, None)
+        main.db.create_daily_plan(user_id, "morning")
+        params = {"user_id": user_id, "daily_plan_id": "morning"}
+
+        response = self.client.get("/daily-plan", params=params)
+        etag = response.headers["etag"]
+        self.assertEqual(response.json(), {"places": []})
+        self.assertEqual(self.client.get("/daily-plan", params=params, headers={"If-None-Match": etag}).status_code, 304)
+        self.assertEqual(self.client.get("/daily-plan", params=params,
+                                         headers={"If-None-Match": f'"stale", W/{etag}'}).status_code, 304)
+        self.assertEqual(self.client.get("/daily-plan", params=params, headers={"If-None-Match": "*"}).status_code, 304)
+
+        main.db.add_to_daily_plan(user_id, "morning", "park1")
+        response = self.client.get("/daily-plan", params=params, headers={"If-None-Match": etag})
+        self.assertEqual([place["ID"] for place in response.json()["places"]], ["park1"])
+
+        response = self.client.get("/daily-plan", params={**params, "daily_plan_id": "evening"},
+                                   headers={"If-None-Match": '"0"'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_route(self):
+        user_id = main.db.add_user(40.7128, -74.0060)
+        main.db.add_activity_group(user_id, "parks")
+        main.db.create_daily_plan(user_id, "morning")
+        for i in range(3):
+            main.db.add_place("parks", user_id, f"Park {i}", "", f"park{i}", 40.0 + i, -73.0, None)
+            main.db.add_to_daily_plan(user_id, "morning", f"park{i}")
+        self.replies["/directions/v2:computeRoutes"] = [httpx.Response(200, json={"routes": [{"distanceMeters": 10}]})]
+
+        response = self.client.get("/route", params={"user_id": user_id, "daily_plan_id": "morning"})
+        self.assertEqual(response.json(), {"route": {"routes": [{"distanceMeters": 10}]}})
+        self.assertEqual(len(self.calls), 1)
+
+        response = self.client.get("/route", params={"user_id": user_id, "daily_plan_id": "evening"})
+        self.assertEqual(response.status_code, 404)
+
+        self.replies["/directions/v2:computeRoutes"] = [httpx.ConnectTimeout("timed out") for _ in range(2)]
+        response = self.client.get("/route", params={"user_id": user_id, "daily_plan_id": "morning"})
+        self.assertEqual(response.status_code, 502)
+        response = self.client.post("/optimize-routes", json={"user_id": user_id})
+        self.assertEqual(response.status_code, 502)
+
+    def test_thread_limit(self):
+        with mock.patch.dict(os.environ, {"HOMEBASE_THREADS": "4"}):
+            self.assertEqual(main.get_thread_limit(), 4)
+        with mock.patch.dict(os.environ, {"HOMEBASE_THREADS": ""}):
+            self.assertEqual(main.get_thread_limit(), os.cpu_count() or 1)
+        for value in ("0", "-2", "four"):
+            with mock.patch.dict(os.environ, {"HOMEBASE_THREADS": value}):
+                with self.assertRaisesRegex(ValueError, "HOMEBASE_THREADS"):
+                    main.get_thread_limit()
+
+if __name__ == '__main__':
+    unittest.main()